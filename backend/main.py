@@ -1,30 +1,118 @@
 """RipeSense Backend API - FastAPI server for produce ripeness classification."""
 
+import os
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, HTTPException
+from typing import Literal
+
+from fastapi import FastAPI, File, HTTPException, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse
 
 from schemas.classification import (
     ClassificationRequest,
     ClassificationResponse,
     ErrorResponse,
 )
+from services.batcher import get_batcher
 from services.classifier import get_classifier
 
+# Largest request body accepted (base64 JSON for an ~8 MB photo, plus slack)
+MAX_REQUEST_BYTES = 12 * 1024 * 1024
+
+# Largest raw image accepted by /classify-binary
+MAX_UPLOAD_BYTES = 8 * 1024 * 1024
+
+
+def worker_count(default: int = 1) -> int:
+    """Number of server worker processes, shared by every launch path.
+    
+    Read from RIPESENSE_WORKERS, falling back to WEB_CONCURRENCY (which
+    uvicorn also uses as its --workers default).
+    """
+    for name in ("RIPESENSE_WORKERS", "WEB_CONCURRENCY"):
+        value = os.environ.get(name)
+        if not value:
+            continue
+        try:
+            return max(1, int(value))
+        except ValueError:
+            print(f"⚠️ Ignoring invalid {name}={value!r}, using {default} worker(s)")
+            return default
+    return default
+
+
+class BodySizeLimitMiddleware:
+    """Reject request bodies over max_bytes before the app reads them.
+    
+    Checks Content-Length up front and also counts the bytes actually
+    received, so chunked uploads without the header are capped too.
+    """
+    
+    def __init__(self, app, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None:
+            try:
+                size = int(content_length)
+            except ValueError:
+                response = JSONResponse(
+                    {"detail": "Invalid Content-Length header"}, status_code=400
+                )
+                await response(scope, receive, send)
+                return
+            
+            if size > self.max_bytes:
+                response = JSONResponse(
+                    {"detail": self._too_large_detail()}, status_code=413
+                )
+                await response(scope, receive, send)
+                return
+        
+        received = 0
+        
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Raised while FastAPI reads the body, so it becomes a 413 response
+                    raise HTTPException(status_code=413, detail=self._too_large_detail())
+            return message
+        
+        await self.app(scope, limited_receive, send)
+    
+    def _too_large_detail(self) -> str:
+        return f"Request body too large (max {self.max_bytes} bytes)"
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Startup and shutdown events."""
     # Startup: Initialize classifier with mock mode (no real model yet)
     print("🥑 Initializing RipeSense API...")
-    classifier = get_classifier(use_mock=False)
+    # Each worker process loads its own model; split the cores between them
+    # so TensorFlow thread pools don't oversubscribe the CPU
+    num_threads = max(1, (os.cpu_count() or 1) // worker_count())
+    classifier = get_classifier(use_mock=False, num_threads=num_threads)
     classifier.load_model("avocado")
+    batcher = get_batcher()
+    classifier.warm_up("avocado", max_batch=batcher.max_batch)
+    await batcher.start()
     print("✅ API ready! (using mock predictions until model is added)")
     
     yield
     
     # Shutdown
     print("👋 Shutting down RipeSense API...")
+    await batcher.stop()
 
 
 app = FastAPI(
@@ -34,12 +122,24 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
-# Configure CORS for mobile app access
+# Browser origins allowed to call the API (native app requests send no Origin
+# header and are unaffected). Add your deployed web app's domain here.
+ALLOWED_ORIGINS = [
+    "http://localhost:8081",  # Expo web dev server
+    "http://localhost:19006",  # Legacy Expo web dev server
+]
+
+# Cap body size before anything is parsed. Added before CORS so that
+# CORS wraps it and 413 responses still carry CORS headers.
+app.add_middleware(BodySizeLimitMiddleware, max_bytes=MAX_REQUEST_BYTES)
+
+# Configure CORS for mobile app access. The app doesn't use cookies, so
+# credentials stay off and origins are matched against a fixed list.
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # In production, restrict to your app's domain
-    allow_credentials=True,
-    allow_methods=["*"],
+    allow_origins=ALLOWED_ORIGINS,
+    allow_credentials=False,
+    allow_methods=["GET", "POST"],
     allow_headers=["*"],
 )
 
@@ -66,9 +166,14 @@ async def health_check():
 
 @app.post(
     "/classify",
-    response_model=ClassificationResponse,
+    # Results are built internally, so skip response validation and
+    # serialize with orjson; the schema is still documented below
+    response_model=None,
+    response_class=ORJSONResponse,
     responses={
+        200: {"model": ClassificationResponse},
         400: {"model": ErrorResponse},
+        413: {"model": ErrorResponse},
         500: {"model": ErrorResponse},
     },
 )
@@ -81,12 +186,59 @@ async def classify_produce(request: ClassificationRequest):
     Returns the predicted ripeness class with confidence scores.
     """
     try:
-        classifier = get_classifier()
-        result = classifier.classify(
+        # Preprocessing runs in the threadpool; inference is batched with
+        # other concurrent requests so neither blocks the event loop
+        result = await get_batcher().classify(
             image_base64=request.image,
             produce_type=request.produce_type,
         )
-        return ClassificationResponse(**result)
+        return ORJSONResponse(result)
+    
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, 
+            detail=f"Classification failed: {str(e)}"
+        )
+
+
+@app.post(
+    "/classify-binary",
+    response_model=None,
+    response_class=ORJSONResponse,
+    responses={
+        200: {"model": ClassificationResponse},
+        400: {"model": ErrorResponse},
+        413: {"model": ErrorResponse},
+        500: {"model": ErrorResponse},
+    },
+)
+async def classify_binary(
+    produce_type: Literal["avocado", "banana"] = "avocado",
+    file: UploadFile = File(...),
+):
+    """Classify produce ripeness from a raw image upload.
+    
+    - **file**: Image file sent as multipart/form-data (no base64 encoding)
+    - **produce_type**: Type of produce to classify (avocado or banana)
+    
+    Returns the predicted ripeness class with confidence scores.
+    """
+    if file.size is not None and file.size > MAX_UPLOAD_BYTES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Image too large (max {MAX_UPLOAD_BYTES} bytes)",
+        )
+    
+    try:
+        image_bytes = await file.read()
+        result = await get_batcher().classify_bytes(
+            image_bytes=image_bytes,
+            produce_type=produce_type,
+        )
+        return ORJSONResponse(result)
     
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -100,9 +252,15 @@ async def classify_produce(request: ClassificationRequest):
 
 if __name__ == "__main__":
     import uvicorn
+    
+    # One worker per core by default; exported so each worker's lifespan
+    # sees the same count when splitting inference threads. The default
+    # "auto" loop/http settings pick uvloop and httptools when installed.
+    workers = worker_count(default=os.cpu_count() or 1)
+    os.environ["RIPESENSE_WORKERS"] = str(workers)
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
         port=8000,
-        reload=True,
+        workers=workers,
     )
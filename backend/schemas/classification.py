@@ -3,12 +3,16 @@
 from typing import Literal, Optional
 from pydantic import BaseModel, Field
 
+# Maximum accepted length of the base64 image string (~8 MB decoded)
+MAX_IMAGE_BASE64_LENGTH = 12_000_000
+
 
 class ClassificationRequest(BaseModel):
     """Request body for classification endpoint."""
     
     image: str = Field(
         ...,
+        max_length=MAX_IMAGE_BASE64_LENGTH,
         description="Base64-encoded image data"
     )
     produce_type: Literal["avocado", "banana"] = Field(
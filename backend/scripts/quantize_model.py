@@ -0,0 +1,82 @@
+"""Convert a Keras produce model to a full-INT8 TFLite model.
+
+The classifier service prefers `models/<produce>/model.tflite` over the Keras
+model when it exists. Full integer quantization needs a representative
+dataset, so pass a directory of sample photos for the produce type.
+
+Usage:
+    python scripts/quantize_model.py avocado path/to/sample_images
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+import tensorflow as tf
+
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from services.classifier import ProduceClassifier  # noqa: E402
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png"}
+MODELS_DIR = BACKEND_DIR / "models"
+
+
+def representative_dataset(images_dir: Path, produce_type: str, limit: int):
+    """Yield sample images preprocessed exactly as the service does.
+
+    Args:
+        images_dir: Directory containing sample images
+        produce_type: Type of produce (avocado, banana)
+        limit: Maximum number of images to yield
+    """
+    # Mock mode: only the preprocessing path is needed, not a loaded model
+    classifier = ProduceClassifier(models_dir=str(MODELS_DIR), use_mock=True)
+    paths = sorted(
+        p for p in images_dir.iterdir() if p.suffix.lower() in IMAGE_SUFFIXES
+    )[:limit]
+    if not paths:
+        raise ValueError(f"No sample images found in {images_dir}")
+
+    for path in paths:
+        yield [classifier.prepare_bytes(path.read_bytes(), produce_type)]
+
+
+def quantize(produce_type: str, images_dir: Path, limit: int) -> Path:
+    """Quantize the Keras model for a produce type and write model.tflite.
+
+    Args:
+        produce_type: Type of produce (avocado, banana)
+        images_dir: Directory of representative sample images
+        limit: Maximum number of sample images to calibrate with
+
+    Returns:
+        Path of the written TFLite model
+    """
+    model_dir = MODELS_DIR / produce_type
+    model = tf.keras.models.load_model(str(model_dir / "keras_model.h5"))
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = lambda: representative_dataset(
+        images_dir, produce_type, limit
+    )
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    converter.inference_input_type = tf.int8
+    converter.inference_output_type = tf.int8
+
+    output_path = model_dir / "model.tflite"
+    output_path.write_bytes(converter.convert())
+    return output_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("produce_type", choices=["avocado", "banana"])
+    parser.add_argument("images_dir", type=Path, help="Directory of sample images")
+    parser.add_argument("--limit", type=int, default=200, help="Max calibration images")
+    args = parser.parse_args()
+
+    path = quantize(args.produce_type, args.images_dir, args.limit)
+    print(f"✅ Wrote INT8 TFLite model to {path}")
@@ -1,8 +1,11 @@
 """Services for RipeSense API."""
 
 from .classifier import ProduceClassifier, get_classifier
+from .batcher import InferenceBatcher, get_batcher
 
 __all__ = [
     "ProduceClassifier",
     "get_classifier",
+    "InferenceBatcher",
+    "get_batcher",
 ]
@@ -0,0 +1,171 @@
+"""Dynamic batching of concurrent classification requests.
+
+Requests are preprocessed independently in the threadpool, then queued so that
+images arriving together are served by a single (B, 224, 224, 3) model call.
+"""
+
+import asyncio
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+
+from .classifier import ProduceClassifier, get_classifier
+
+
+@dataclass
+class _PendingItem:
+    """A preprocessed image waiting for its row of the batched output."""
+
+    produce_type: str
+    input_data: np.ndarray
+    future: asyncio.Future
+
+
+class InferenceBatcher:
+    """Merges concurrent single-image inference calls into batched model calls."""
+
+    def __init__(
+        self,
+        classifier: ProduceClassifier,
+        max_batch: int = 8,
+        max_wait: float = 0.005
+    ):
+        """Initialize the batcher.
+
+        Args:
+            classifier: Classifier used for preprocessing and inference
+            max_batch: Maximum number of images per model call
+            max_wait: Seconds to wait for more requests to join a partial
+                batch; only applied while under load, so a lone request
+                is never delayed
+        """
+        self.classifier = classifier
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """Start the background batching loop on the running event loop."""
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Cancel the batching loop."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def classify(self, image_base64: str, produce_type: str) -> dict:
+        """Classify a base64-encoded image through the batch queue."""
+        key, result, input_data = await run_in_threadpool(
+            self._prepare_base64, image_base64, produce_type
+        )
+        if result is not None:
+            return result
+        return await self._predict(key, input_data, produce_type)
+
+    async def classify_bytes(self, image_bytes: bytes, produce_type: str) -> dict:
+        """Classify raw image bytes through the batch queue."""
+        key, result, input_data = await run_in_threadpool(
+            self._prepare, image_bytes, produce_type
+        )
+        if result is not None:
+            return result
+        return await self._predict(key, input_data, produce_type)
+
+    def _prepare_base64(self, image_base64: str, produce_type: str):
+        """Decode a base64 image, then look it up or preprocess it."""
+        return self._prepare(self.classifier.decode_base64(image_base64), produce_type)
+
+    def _prepare(self, image_bytes: bytes, produce_type: str):
+        """Return (cache key, cached result, None) or (cache key, None, model input)."""
+        key = self.classifier.result_cache_key(produce_type, image_bytes)
+        result = self.classifier.get_cached_result(key)
+        if result is not None:
+            return key, result, None
+        return key, None, self.classifier.prepare_bytes(image_bytes, produce_type)
+
+    async def _predict(
+        self,
+        key: tuple[str, bytes],
+        input_data: np.ndarray,
+        produce_type: str
+    ) -> dict:
+        """Queue a preprocessed image and build and cache its result once inferred."""
+        if self._task is None:
+            raise RuntimeError("InferenceBatcher has not been started")
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(_PendingItem(produce_type, input_data, future))
+        predictions = await future
+        result = self.classifier.build_result(produce_type, predictions)
+        self.classifier.cache_result(key, result)
+        return result
+
+    async def _run(self) -> None:
+        """Drain the queue into batches and run them until cancelled."""
+        loaded = False
+        while True:
+            items = [await self._queue.get()]
+            self._drain(items)
+
+            # Under load, give concurrent requests a moment to fill the batch
+            if loaded and len(items) < self.max_batch:
+                await asyncio.sleep(self.max_wait)
+                self._drain(items)
+            loaded = len(items) > 1
+
+            # Each produce type has its own model, so batch them separately
+            groups: dict[str, list[_PendingItem]] = {}
+            for item in items:
+                groups.setdefault(item.produce_type, []).append(item)
+
+            for produce_type, group in groups.items():
+                await self._run_group(produce_type, group)
+
+    def _drain(self, items: list[_PendingItem]) -> None:
+        """Move already-queued items into the batch, up to max_batch."""
+        while len(items) < self.max_batch and not self._queue.empty():
+            items.append(self._queue.get_nowait())
+
+    async def _run_group(self, produce_type: str, group: list[_PendingItem]) -> None:
+        """Run one batched model call and resolve each item's future."""
+        try:
+            # A lone request already has the (1, 224, 224, 3) batch shape
+            if len(group) == 1:
+                batch = group[0].input_data
+            else:
+                batch = np.concatenate([item.input_data for item in group])
+            outputs = await run_in_threadpool(
+                self.classifier.predict_batch, produce_type, batch
+            )
+        except Exception as e:
+            for item in group:
+                if not item.future.done():
+                    item.future.set_exception(e)
+            return
+
+        for item, row in zip(group, outputs):
+            # The client may have disconnected and cancelled its future
+            if not item.future.done():
+                item.future.set_result(row)
+
+
+# Singleton instance for use across the app
+_batcher: Optional[InferenceBatcher] = None
+
+
+def get_batcher() -> InferenceBatcher:
+    """Get or create the singleton batcher around the singleton classifier."""
+    global _batcher
+    if _batcher is None:
+        _batcher = InferenceBatcher(get_classifier())
+    return _batcher
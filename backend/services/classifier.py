@@ -1,18 +1,34 @@
 """TensorFlow Keras model classifier service.
 
-This service loads Keras models (.h5 or SavedModel format) for produce ripeness classification.
-Currently uses mock predictions until real models are added.
+This service loads TFLite models (preferred, e.g. INT8-quantized) or Keras models
+(.h5 or SavedModel format) for produce ripeness classification.
+Falls back to mock predictions when no model is available.
 """
 
-import base64
+import hashlib
 import io
-import random
+import os
+import threading
+from collections import OrderedDict
 from typing import Optional
 from pathlib import Path
 
 import numpy as np
 from PIL import Image
 
+# pybase64 provides a SIMD-accelerated decoder; fall back to the stdlib otherwise
+try:
+    import pybase64 as base64
+except ImportError:
+    import base64
+
+# OpenCV's resize is considerably faster than stock Pillow; optional
+try:
+    import cv2
+    CV2_AVAILABLE = True
+except ImportError:
+    CV2_AVAILABLE = False
+
 # TensorFlow import - will be used when real models are added
 try:
     import tensorflow as tf
@@ -40,27 +56,69 @@ BANANA_CLASSES = {
 # Expected input size for Teachable Machine models
 MODEL_INPUT_SIZE = (224, 224)
 
+# Upper bound on the "data:<mime>;base64," prefix length searched for a comma
+DATA_URL_HEADER_MAX = 256
+
+# Number of results kept for repeated uploads of the same image
+RESULT_CACHE_SIZE = 512
+
+# Leading bytes of every JPEG file (SOI marker + first segment marker)
+JPEG_MAGIC = b"\xff\xd8\xff"
+
 
 class ProduceClassifier:
-    """Classifier for produce ripeness detection using Keras models."""
+    """Classifier for produce ripeness detection using TFLite or Keras models."""
     
-    def __init__(self, models_dir: str = "models", use_mock: bool = True):
+    def __init__(
+        self, 
+        models_dir: str = "models", 
+        use_mock: bool = True, 
+        num_threads: Optional[int] = None
+    ):
         """Initialize the classifier with model directory path.
         
         Args:
             models_dir: Path to directory containing model subdirectories
             use_mock: If True, use mock predictions (for development)
+            num_threads: CPU threads for inference; defaults to all cores.
+                Lower this when running several worker processes.
         """
         self.models_dir = Path(models_dir)
+        self.num_threads = num_threads or os.cpu_count()
+        if TF_AVAILABLE and num_threads is not None:
+            try:
+                tf.config.threading.set_intra_op_parallelism_threads(num_threads)
+            except RuntimeError as e:
+                # TensorFlow's runtime was already initialized in this process
+                print(f"⚠️ Could not limit TensorFlow threads: {e}")
         self.models: dict[str, any] = {}
+        # Inference callables mapping a (B, 224, 224, 3) float32 batch to class
+        # scores, chosen once at load time (real model or mock)
+        self._infer: dict[str, any] = {}
         self.use_mock = use_mock
+        self._rng = np.random.default_rng()
+        # LRU of results keyed by (produce_type, SHA256 of the raw image bytes)
+        self._result_cache: OrderedDict[tuple[str, bytes], dict] = OrderedDict()
+        self._cache_lock = threading.Lock()
         self.class_mappings = {
             "avocado": AVOCADO_CLASSES,
             "banana": BANANA_CLASSES,
         }
+        # Class names/labels frozen into index-ordered tuples for the hot path
+        self._names = {
+            pt: tuple(m[i]["name"] for i in sorted(m))
+            for pt, m in self.class_mappings.items()
+        }
+        self._labels = {
+            pt: tuple(m[i]["label"] for i in sorted(m))
+            for pt, m in self.class_mappings.items()
+        }
         
     def load_model(self, produce_type: str) -> bool:
-        """Load a Keras model for the specified produce type.
+        """Load a model for the specified produce type.
+        
+        Prefers an INT8 TFLite model (model.tflite), then Keras H5, then
+        SavedModel, falling back to mock predictions if none load.
         
         Args:
             produce_type: Type of produce (avocado, banana)
@@ -70,7 +128,7 @@ class ProduceClassifier:
         """
         if self.use_mock:
             print(f"🎭 Using mock predictions for {produce_type}")
-            self.models[produce_type] = "mock"
+            self._use_mock(produce_type)
             return True
             
         if produce_type in self.models:
@@ -79,38 +137,130 @@ class ProduceClassifier:
         if not TF_AVAILABLE:
             print("TensorFlow not available, falling back to mock")
             self.use_mock = True
-            self.models[produce_type] = "mock"
+            self._use_mock(produce_type)
             return True
         
-        # Try loading Keras H5 model first, then SavedModel format
+        # Try loading TFLite model first, then Keras H5, then SavedModel format
+        tflite_path = self.models_dir / produce_type / "model.tflite"
         h5_path = self.models_dir / produce_type / "keras_model.h5"
         saved_model_path = self.models_dir / produce_type / "saved_model"
         
         model_path = None
-        if h5_path.exists():
+        if tflite_path.exists():
+            model_path = tflite_path
+        elif h5_path.exists():
             model_path = h5_path
         elif saved_model_path.exists():
             model_path = saved_model_path
         
         if model_path is None:
             print(f"⚠️ No model found for {produce_type}, using mock predictions")
-            print(f"   Expected: {h5_path} or {saved_model_path}")
-            self.models[produce_type] = "mock"
+            print(f"   Expected: {tflite_path}, {h5_path} or {saved_model_path}")
+            self._use_mock(produce_type)
             return True
             
         try:
-            model = tf.keras.models.load_model(str(model_path))
-            self.models[produce_type] = model
-            print(f"✅ Loaded Keras model for {produce_type} from {model_path}")
-            print(f"   Input shape: {model.input_shape}")
-            print(f"   Output shape: {model.output_shape}")
+            if model_path == tflite_path:
+                self._load_tflite_model(produce_type, model_path)
+            else:
+                self._load_keras_model(produce_type, model_path)
             return True
         except Exception as e:
             print(f"❌ Error loading model for {produce_type}: {e}")
             print(f"   Falling back to mock predictions")
-            self.models[produce_type] = "mock"
+            self._use_mock(produce_type)
             return True
     
+    def _use_mock(self, produce_type: str) -> None:
+        """Serve mock predictions for the specified produce type."""
+        self.models[produce_type] = "mock"
+        self._infer[produce_type] = lambda x: np.stack(
+            [self._mock_predict(produce_type) for _ in range(len(x))]
+        )
+    
+    def _load_keras_model(self, produce_type: str, model_path: Path) -> None:
+        """Load a Keras model and trace a concrete inference function for it."""
+        model = tf.keras.models.load_model(str(model_path))
+        # Trace once so inference bypasses model.predict's per-call overhead
+        concrete = tf.function(
+            lambda x: model(x, training=False)
+        ).get_concrete_function(
+            tf.TensorSpec((None, *MODEL_INPUT_SIZE, 3), tf.float32)
+        )
+        self._infer[produce_type] = lambda x: concrete(tf.constant(x)).numpy()
+        self.models[produce_type] = model
+        print(f"✅ Loaded Keras model for {produce_type} from {model_path}")
+        print(f"   Input shape: {model.input_shape}")
+        print(f"   Output shape: {model.output_shape}")
+    
+    def _load_tflite_model(self, produce_type: str, model_path: Path) -> None:
+        """Load a TFLite model, handling quantized (int8/uint8) input and output."""
+        interpreter = tf.lite.Interpreter(
+            model_path=str(model_path), num_threads=self.num_threads
+        )
+        interpreter.allocate_tensors()
+        input_details = interpreter.get_input_details()[0]
+        output_details = interpreter.get_output_details()[0]
+        input_index = input_details["index"]
+        output_index = output_details["index"]
+        input_dtype = input_details["dtype"]
+        input_scale, input_zero = input_details["quantization"]
+        output_scale, output_zero = output_details["quantization"]
+        # Resizing means reallocating tensors, so keep one interpreter per batch
+        # size instead of resizing whenever the batch size changes. warm_up
+        # creates these at startup; creation here is only a fallback.
+        interpreters = {int(input_details["shape"][0]): interpreter}
+        # Interpreters aren't thread-safe; serialize create/set/invoke/get
+        lock = threading.Lock()
+        
+        def infer(x: np.ndarray) -> np.ndarray:
+            if input_dtype != np.float32:
+                # Clip so values past the calibrated range saturate instead of wrapping
+                info = np.iinfo(input_dtype)
+                x = np.clip(
+                    np.round(x / input_scale + input_zero), info.min, info.max
+                ).astype(input_dtype)
+            with lock:
+                batch_interpreter = interpreters.get(len(x))
+                if batch_interpreter is None:
+                    batch_interpreter = tf.lite.Interpreter(
+                        model_path=str(model_path), num_threads=self.num_threads
+                    )
+                    batch_interpreter.resize_tensor_input(input_index, x.shape)
+                    batch_interpreter.allocate_tensors()
+                    interpreters[len(x)] = batch_interpreter
+                batch_interpreter.set_tensor(input_index, x)
+                batch_interpreter.invoke()
+                output = batch_interpreter.get_tensor(output_index)
+            if output.dtype != np.float32:
+                output = (output.astype(np.float32) - output_zero) * output_scale
+            return output
+        
+        self._infer[produce_type] = infer
+        self.models[produce_type] = interpreter
+        print(f"✅ Loaded TFLite model for {produce_type} from {model_path}")
+        print(f"   Input: {input_details['shape']} {input_dtype.__name__}")
+        print(f"   Output: {output_details['shape']} {output_details['dtype'].__name__}")
+    
+    def warm_up(self, produce_type: str, max_batch: int = 1) -> None:
+        """Run dummy inferences so real requests skip one-time setup costs.
+        
+        Covers every batch size up to max_batch, which traces the Keras graph
+        and creates the per-batch-size TFLite interpreters ahead of traffic.
+        
+        Args:
+            produce_type: Type of produce whose model should be warmed up
+            max_batch: Largest batch size that will be served
+        """
+        model = self.models.get(produce_type)
+        if model is None or model == "mock" or not TF_AVAILABLE:
+            return
+        
+        for batch_size in range(1, max_batch + 1):
+            dummy = np.zeros((batch_size, *MODEL_INPUT_SIZE, 3), dtype=np.float32)
+            self._infer[produce_type](dummy)
+        print(f"🔥 Warmed up model for {produce_type} (batch sizes 1-{max_batch})")
+    
     def preprocess_image(self, image: Image.Image) -> np.ndarray:
         """Preprocess image for model input.
         
@@ -122,16 +272,67 @@ class ProduceClassifier:
         """
         # Resize image to model input size (224x224 for Teachable Machine)
         image = image.convert('RGB')
-        image = image.resize(MODEL_INPUT_SIZE, Image.Resampling.LANCZOS)
+        if CV2_AVAILABLE:
+            # INTER_AREA is the recommended filter for downsampling
+            pixels = cv2.resize(
+                np.asarray(image), MODEL_INPUT_SIZE, interpolation=cv2.INTER_AREA
+            )
+        else:
+            pixels = np.asarray(image.resize(MODEL_INPUT_SIZE, Image.Resampling.LANCZOS))
+        
+        # Normalize to [0, 1] straight into a (1, 224, 224, 3) float32 array
+        img_array = np.empty((1, *MODEL_INPUT_SIZE, 3), dtype=np.float32)
+        np.multiply(pixels, np.float32(1.0 / 255.0), out=img_array[0], dtype=np.float32)
+        
+        return img_array
+    
+    def preprocess_jpeg(self, image_bytes: bytes) -> np.ndarray:
+        """Decode and preprocess a JPEG with TensorFlow's libjpeg-turbo kernels.
         
-        # Convert to numpy array and normalize to [0, 1]
-        img_array = np.array(image, dtype=np.float32) / 255.0
+        Like Pillow's draft mode, the JPEG is downscaled during decoding by the
+        largest DCT ratio that keeps both sides at least MODEL_INPUT_SIZE.
+        
+        Args:
+            image_bytes: JPEG file contents
+            
+        Returns:
+            Preprocessed numpy array ready for inference
+        """
+        height, width = tf.io.extract_jpeg_shape(image_bytes).numpy()[:2]
+        ratio = next(
+            r for r in (8, 4, 2, 1)
+            if r == 1 or (height // r >= MODEL_INPUT_SIZE[1] and width // r >= MODEL_INPUT_SIZE[0])
+        )
+        image = tf.io.decode_jpeg(
+            image_bytes, channels=3, ratio=ratio, dct_method="INTEGER_FAST"
+        )
+        # Area averaging matches the OpenCV INTER_AREA downsampling path
+        image = tf.image.resize(image, MODEL_INPUT_SIZE, method="area")
         
-        # Add batch dimension
-        img_array = np.expand_dims(img_array, axis=0)
+        img_array = np.empty((1, *MODEL_INPUT_SIZE, 3), dtype=np.float32)
+        np.multiply(image.numpy(), np.float32(1.0 / 255.0), out=img_array[0], dtype=np.float32)
         
         return img_array
     
+    def decode_image_bytes(self, image_data: bytes) -> Image.Image:
+        """Open raw (already decoded) image bytes.
+        
+        JPEGs are opened in draft mode, so they decode at the smallest DCT
+        scale that is still at least MODEL_INPUT_SIZE.
+        
+        Args:
+            image_data: Encoded image file contents (JPEG, PNG, ...)
+            
+        Returns:
+            PIL Image object
+        """
+        # BytesIO shares the bytes object without copying, so there's nothing to pool
+        image = Image.open(io.BytesIO(image_data))
+        # Let the JPEG decoder downscale via DCT while decoding (no-op for other formats)
+        image.draft('RGB', MODEL_INPUT_SIZE)
+        
+        return image
+    
     def decode_base64_image(self, base64_string: str) -> Image.Image:
         """Decode a base64-encoded image string.
         
@@ -141,14 +342,27 @@ class ProduceClassifier:
         Returns:
             PIL Image object
         """
-        # Handle data URL format (e.g., "data:image/jpeg;base64,...")
-        if ',' in base64_string:
-            base64_string = base64_string.split(',')[1]
+        return self.decode_image_bytes(self.decode_base64(base64_string))
+    
+    def decode_base64(self, base64_string: str) -> bytes:
+        """Decode base64 image data (optionally a data URL) to raw bytes.
+        
+        Args:
+            base64_string: Base64-encoded image data
             
-        image_data = base64.b64decode(base64_string)
-        image = Image.open(io.BytesIO(image_data))
+        Returns:
+            Encoded image file contents
+        """
+        # Work on bytes so the decoder skips its implicit str -> ASCII encode
+        payload = base64_string.encode('ascii')
         
-        return image
+        # Handle data URL format (e.g., "data:image/jpeg;base64,...")
+        # Base64 never contains ',', so only the short header needs scanning
+        comma = payload.find(b',', 0, DATA_URL_HEADER_MAX)
+        if comma != -1:
+            payload = memoryview(payload)[comma + 1:]
+            
+        return base64.b64decode(payload, validate=False)
     
     def _mock_predict(self, produce_type: str) -> np.ndarray:
         """Generate mock predictions for testing.
@@ -163,14 +377,14 @@ class ProduceClassifier:
         num_classes = len(class_mapping)
         
         # Generate random predictions with one dominant class
-        predictions = np.random.random(num_classes).astype(np.float32)
+        predictions = self._rng.random(num_classes, dtype=np.float32)
         
         # Make one class dominant (70-95% confidence)
-        dominant_idx = random.randint(0, num_classes - 1)
-        predictions[dominant_idx] = random.uniform(0.7, 0.95)
+        dominant_idx = self._rng.integers(0, num_classes)
+        predictions[dominant_idx] = self._rng.uniform(0.7, 0.95)
         
         # Normalize to sum to 1
-        predictions = predictions / predictions.sum()
+        predictions /= predictions.sum()
         
         return predictions
     
@@ -188,39 +402,117 @@ class ProduceClassifier:
         Returns:
             Classification result dictionary
         """
-        # Ensure model is loaded
-        if not self.load_model(produce_type):
+        return self.classify_bytes(self.decode_base64(image_base64), produce_type)
+    
+    def classify_bytes(
+        self, 
+        image_bytes: bytes, 
+        produce_type: str = "avocado"
+    ) -> dict:
+        """Classify raw image bytes, skipping the base64 decode step.
+        
+        Args:
+            image_bytes: Encoded image file contents (JPEG, PNG, ...)
+            produce_type: Type of produce to classify
+            
+        Returns:
+            Classification result dictionary
+        """
+        key = self.result_cache_key(produce_type, image_bytes)
+        result = self.get_cached_result(key)
+        if result is not None:
+            return result
+        
+        input_data = self.prepare_bytes(image_bytes, produce_type)
+        predictions = self.predict_batch(produce_type, input_data)[0]
+        result = self.build_result(produce_type, predictions)
+        self.cache_result(key, result)
+        return result
+    
+    def prepare_bytes(self, image_bytes: bytes, produce_type: str) -> np.ndarray:
+        """Ensure the model is loaded and preprocess encoded image bytes.
+        
+        Args:
+            image_bytes: Encoded image file contents (JPEG, PNG, ...)
+            produce_type: Type of produce to classify
+            
+        Returns:
+            (1, 224, 224, 3) float32 model input
+        """
+        # Ensure model is loaded (skip the filesystem checks once cached)
+        if produce_type not in self.models and not self.load_model(produce_type):
             raise ValueError(f"Model not available for produce type: {produce_type}")
         
-        # Decode and preprocess image
-        image = self.decode_base64_image(image_base64)
-        input_data = self.preprocess_image(image)
+        # JPEGs go through TensorFlow's fused decode + resize when available
+        if TF_AVAILABLE and image_bytes[:3] == JPEG_MAGIC:
+            return self.preprocess_jpeg(image_bytes)
         
-        # Run inference (or mock)
-        model = self.models.get(produce_type)
+        # Preprocess image, releasing the decoded pixel data as soon as we're done
+        with self.decode_image_bytes(image_bytes) as image:
+            return self.preprocess_image(image)
+    
+    def predict_batch(self, produce_type: str, batch: np.ndarray) -> np.ndarray:
+        """Run inference (or mock) on a batch of preprocessed images.
         
-        if model == "mock" or not TF_AVAILABLE:
-            predictions = self._mock_predict(produce_type)
-        else:
-            output = model.predict(input_data, verbose=0)
-            predictions = output[0]  # Remove batch dimension
+        Args:
+            produce_type: Type of produce to classify
+            batch: (B, 224, 224, 3) float32 model input
+            
+        Returns:
+            (B, num_classes) array of confidence scores
+        """
+        return self._infer[produce_type](batch)
+    
+    def result_cache_key(self, produce_type: str, image_bytes: bytes) -> tuple[str, bytes]:
+        """Build the result cache key for an image's raw (decoded) bytes."""
+        return produce_type, hashlib.sha256(image_bytes).digest()
+    
+    def get_cached_result(self, key: tuple[str, bytes]) -> Optional[dict]:
+        """Return the cached result for a key, marking it recently used."""
+        with self._cache_lock:
+            result = self._result_cache.get(key)
+            if result is not None:
+                self._result_cache.move_to_end(key)
+            return result
+    
+    def cache_result(self, key: tuple[str, bytes], result: dict) -> None:
+        """Store a result, evicting the least recently used entry when full."""
+        with self._cache_lock:
+            self._result_cache[key] = result
+            self._result_cache.move_to_end(key)
+            if len(self._result_cache) > RESULT_CACHE_SIZE:
+                self._result_cache.popitem(last=False)
+    
+    def build_result(self, produce_type: str, predictions: np.ndarray) -> dict:
+        """Build the response dictionary from one image's confidence scores.
+        
+        Args:
+            produce_type: Type of produce classified
+            predictions: (num_classes,) array of confidence scores
+            
+        Returns:
+            Classification result dictionary
+        """
+        # Get class names and labels for this produce type
+        names = self._names.get(produce_type, ())
+        labels = self._labels.get(produce_type, ())
+        num_known = len(names)
         
-        # Get class mapping for this produce type
-        class_mapping = self.class_mappings.get(produce_type, {})
+        # Order class indices by confidence (highest first, ties keep class order)
+        order = np.argsort(-predictions, kind="stable").tolist()
+        # Convert all scores to Python floats in one pass
+        confidences = predictions.tolist()
         
-        # Build predictions list
+        # Build predictions list in sorted order
         all_predictions = []
-        for idx, confidence in enumerate(predictions):
-            class_info = class_mapping.get(idx, {"name": f"class_{idx}", "label": f"Class {idx}"})
+        for idx in order:
+            known = idx < num_known
             all_predictions.append({
-                "class_name": class_info["name"],
-                "class_label": class_info["label"],
-                "confidence": float(confidence),
+                "class_name": names[idx] if known else f"class_{idx}",
+                "class_label": labels[idx] if known else f"Class {idx}",
+                "confidence": confidences[idx],
             })
         
-        # Sort by confidence (highest first)
-        all_predictions.sort(key=lambda x: x["confidence"], reverse=True)
-        
         # Get top prediction
         top_prediction = all_predictions[0]
         
@@ -238,15 +530,23 @@ class ProduceClassifier:
 _classifier: Optional[ProduceClassifier] = None
 
 
-def get_classifier(use_mock: bool = False) -> ProduceClassifier:
+def get_classifier(
+    use_mock: bool = False, 
+    num_threads: Optional[int] = None
+) -> ProduceClassifier:
     """Get or create the singleton classifier instance.
     
     Args:
         use_mock: If True, use mock predictions (set False when real model is added)
+        num_threads: CPU threads for inference (see ProduceClassifier)
     """
     global _classifier
     if _classifier is None:
         # Use absolute path relative to this file
         models_dir = Path(__file__).parent.parent / "models"
-        _classifier = ProduceClassifier(models_dir=str(models_dir), use_mock=use_mock)
+        _classifier = ProduceClassifier(
+            models_dir=str(models_dir), 
+            use_mock=use_mock, 
+            num_threads=num_threads,
+        )
     return _classifier